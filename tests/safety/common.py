@@ -3,7 +3,7 @@ import abc
 import unittest
 import importlib
 import numpy as np
-from typing import Optional, List, Dict
+from typing import Optional, Dict, Iterable, Sequence
 
 from opendbc.can.packer import CANPacker  # pylint: disable=import-error
 from panda import ALTERNATIVE_EXPERIENCE, LEN_TO_DLC
@@ -71,6 +71,15 @@ class PandaSafetyTestBase(unittest.TestCase):
   def _tx(self, msg):
     return self.safety.safety_tx_hook(msg)
 
+  def _tx_batch(self, msgs):
+    # submit a list of pre-packed frames through the tx hook in a single FFI call
+    pkts = libpandasafety_py.ffi.new('CANPacket_t[]', len(msgs))
+    results = libpandasafety_py.ffi.new('int[]', len(msgs))
+    for i, msg in enumerate(msgs):
+      pkts[i] = msg[0]
+    self.safety.safety_tx_hook_batch(pkts, results, len(msgs))
+    return list(results)
+
 
 class InterceptorSafetyTest(PandaSafetyTestBase):
 
@@ -488,7 +497,8 @@ class MotorTorqueSteeringSafetyTest(TorqueSteeringSafetyTestBase):
 
 @add_regen_tests
 class PandaSafetyTest(PandaSafetyTestBase):
-  TX_MSGS: Optional[List[List[int]]] = None
+  # any iterable of (addr, bus) pairs; frozensets of tuples give O(1) membership checks
+  TX_MSGS: Optional[Iterable[Sequence[int]]] = None
   SCANNED_ADDRS = [*range(0x0, 0x800),                      # Entire 11-bit CAN address space
                    *range(0x18DA00F1, 0x18DB00F1, 0x100),   # 29-bit UDS physical addressing
                    *range(0x18DB00F1, 0x18DC00F1, 0x100),   # 29-bit UDS functional addressing
@@ -498,7 +508,7 @@ class PandaSafetyTest(PandaSafetyTestBase):
   GAS_PRESSED_THRESHOLD = 0
   RELAY_MALFUNCTION_ADDR: Optional[int] = None
   RELAY_MALFUNCTION_BUS: Optional[int] = None
-  FWD_BLACKLISTED_ADDRS: Dict[int, List[int]] = {}  # {bus: [addr]}
+  FWD_BLACKLISTED_ADDRS: Dict[int, Iterable[int]] = {}  # {bus: [addr]}
   FWD_BUS_LOOKUP: Dict[int, int] = {}
 
   @classmethod
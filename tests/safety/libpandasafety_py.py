@@ -17,8 +17,10 @@ typedef struct {
   unsigned char extended : 1;
   unsigned int addr : 29;
   unsigned char data[64];
+  unsigned char padding[3];  // the C side is aligned(4), pad so array strides match
 } CANPacket_t;
 """, packed=True)
+assert ffi.sizeof('CANPacket_t') == 72
 
 ffi.cdef("""
 typedef struct
@@ -58,6 +60,7 @@ void set_timer(uint32_t t);
 
 int safety_rx_hook(CANPacket_t *to_send);
 int safety_tx_hook(CANPacket_t *to_push);
+void safety_tx_hook_batch(CANPacket_t *to_send, int *results, int len);
 int safety_fwd_hook(int bus_num, CANPacket_t *to_fwd);
 int set_safety_hooks(uint16_t mode, uint16_t param);
 
@@ -119,6 +122,7 @@ class PandaSafety:
 
   def safety_rx_hook(self, to_send: CANPacket) -> int: ...
   def safety_tx_hook(self, to_push: CANPacket) -> int: ...
+  def safety_tx_hook_batch(self, to_send: List[CANPacket], results: List[int], length: int) -> None: ...
   def safety_fwd_hook(self, bus_num: int, to_fwd: CANPacket) -> int: ...
   def set_safety_hooks(self, mode: int, param: int) -> int: ...
 
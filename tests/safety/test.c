@@ -73,6 +73,13 @@ void safety_tick_current_rx_checks() {
   safety_tick(current_rx_checks);
 }
 
+// run the tx hook over an array of packets in one call to amortize FFI overhead
+void safety_tx_hook_batch(CANPacket_t *to_send, int *results, int len) {
+  for (int i = 0; i < len; i++) {
+    results[i] = safety_tx_hook(&to_send[i]);
+  }
+}
+
 bool addr_checks_valid() {
   if (current_rx_checks->len <= 0) {
     printf("missing RX checks\n");
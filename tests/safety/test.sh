@@ -6,7 +6,10 @@ set -e
 
 scons -u --test
 
+# leave a couple cores free, each test file gets its own worker
+NJOBS=$(( $(nproc) > 2 ? $(nproc) - 2 : 1 ))
+
 for hw_type in {0..7}; do
   echo "Testing HW_TYPE: $hw_type"
-  HW_TYPE=$hw_type python -m unittest discover .
+  HW_TYPE=$hw_type python -m pytest -n $NJOBS --dist=loadfile .
 done